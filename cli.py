@@ -2,10 +2,17 @@
 import argparse
 import logging
 import os
+import sys
 
 from dotenv import load_dotenv
-from db_conn import get_conn
-from logic_copy import orchestrate
+from db_conn import DEFAULT_MAX_REPLICA_LAG, choose_read_conn, get_conn, get_max_replica_lag, get_read_conn
+from logic_copy import STUDENT_2ON1_POLICIES, orchestrate
+from name_index import build_name_index, load_new_course_name_index
+from preflight import DEFAULT_MIN_ROWS, run_preflight
+from run_build_joins import JOIN_TABLES
+from snapshot import export_snapshot, load_snapshot
+from txn_batch import DEFAULT_COMMIT_EVERY
+from verify_joins import DEFAULT_CHUNK_SIZE, verify_join_table
 
 
 def setup_logging(verbose: bool = False) -> None:
@@ -14,6 +21,27 @@ def setup_logging(verbose: bool = False) -> None:
     logging.basicConfig(level=level, format='%(asctime)s %(levelname)s %(message)s')
 
 
+def log_summary(summary: dict, normalized_match: bool = False) -> None:
+    """Log the end-of-run counters returned by orchestrate."""
+    logging.info(
+        "Done. Paths processed=%s, matched rows=%s, rows updated=%s, rows unchanged=%s",
+        summary['paths_processed'], summary['matched_rows'], summary['rows_updated'], summary['rows_unchanged']
+    )
+    logging.info(
+        "new_student_data: students updated=%s, unchanged=%s, conflicts resolved=%s",
+        summary['students_updated'], summary['students_unchanged'], summary['student_conflicts']
+    )
+    if normalized_match:
+        logging.info(
+            "Paths matched only after normalization=%s, ambiguous normalized names=%s",
+            summary['normalized_matches'], summary['ambiguous_matches']
+        )
+    logging.info(
+        "Transactions: commits=%s, commit time=%.3fs, failed rows rolled back=%s",
+        summary['commits'], summary['commit_seconds'], summary['failed_steps']
+    )
+
+
 def main():
     """Entry point for command-line execution."""
     # Load environment variables from .env if present (local dev)
@@ -22,30 +50,101 @@ def main():
     parser.add_argument('--input', default='b2b_paths/b2b_paths.cleaned.csv', help='Input file with one path per line')
     parser.add_argument('--dry-run', action='store_true', help='Do not write to DB, only log actions')
     parser.add_argument('--verbose', action='store_true', help='Verbose logging')
+    parser.add_argument('--normalized-match', action='store_true', help='Load new_course names into memory once and also match ignoring case, accents and extra whitespace')
+    parser.add_argument('--2on1-policy', dest='student_policy', choices=STUDENT_2ON1_POLICIES, default='last-wins', help='How to resolve different is_2on1 values for the same student (default: last-wins)')
+    parser.add_argument('--snapshot', metavar='DIR', help='Decide everything offline from a snapshot directory (implies --dry-run; no DB connection)')
+    parser.add_argument('--max-replica-lag', type=float, default=get_max_replica_lag(), help='Seconds of replica lag above which reads fall back to the primary (only with DATABASE_READ_URL; default: env DATABASE_READ_MAX_LAG or %s)' % DEFAULT_MAX_REPLICA_LAG)
+    parser.add_argument('--commit-every', type=int, default=DEFAULT_COMMIT_EVERY, help='Commit after this many paths/student writes; 0 = one commit at the end (default: %(default)s)')
+    sub = parser.add_subparsers(dest='command')
+    p_pre = sub.add_parser('preflight', help='Check indexes and EXPLAIN hot queries before a run (go/no-go)')
+    p_pre.add_argument('--apply', action='store_true', help='Create missing indexes with CREATE INDEX CONCURRENTLY')
+    p_pre.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS, help='Flag seq scans only on tables with at least this many (estimated) rows')
+    p_pre.add_argument('--verbose', action='store_true', default=argparse.SUPPRESS, help='Verbose logging')
+    p_snap = sub.add_parser('snapshot', help='Export the columns the updater needs to local files with COPY')
+    p_snap.add_argument('--out', default='snapshot', help='Output directory (default: snapshot)')
+    p_snap.add_argument('--verbose', action='store_true', default=argparse.SUPPRESS, help='Verbose logging')
+    p_ver = sub.add_parser('verify', help='Verify *_join tables against their sources with chunked checksums')
+    p_ver.add_argument('--table', action='append', choices=[j for _, _, j in JOIN_TABLES], help='Join table to verify (repeatable; default: all)')
+    p_ver.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Ids per bucket (default: %(default)s)')
+    p_ver.add_argument('--verbose', action='store_true', default=argparse.SUPPRESS, help='Verbose logging')
     args = parser.parse_args()
 
     setup_logging(args.verbose)
 
+    if args.command == 'preflight':
+        conn = get_conn()
+        try:
+            ok = run_preflight(conn, apply=args.apply, min_rows=args.min_rows)
+        finally:
+            conn.close()
+        sys.exit(0 if ok else 1)
+
+    if args.command == 'verify':
+        conn = get_conn()
+        ok = True
+        try:
+            for base_table, taas_table, join_table in JOIN_TABLES:
+                if args.table and join_table not in args.table:
+                    continue
+                ok = verify_join_table(
+                    conn, get_conn, base_table, taas_table, join_table,
+                    chunk_size=args.chunk_size,
+                ) and ok
+        finally:
+            conn.close()
+        logging.info("Verify result: %s", "OK" if ok else "MISMATCH")
+        sys.exit(0 if ok else 1)
+
+    if args.command == 'snapshot':
+        conn = get_conn()
+        read_conn = get_read_conn()
+        try:
+            export_snapshot(choose_read_conn(conn, read_conn, args.max_replica_lag), args.out)
+        finally:
+            if read_conn is not None:
+                read_conn.close()
+            conn.close()
+        return
+
     if not os.path.exists(args.input):
         logging.warning(f"Input file not found: {args.input}")
 
+    dry_run = args.dry_run or bool(args.snapshot)
     logging.info(
         "Starting update run with input=%s dry_run=%s verbose=%s",
         args.input,
-        args.dry_run,
+        dry_run,
         args.verbose,
     )
-    if args.dry_run:
+    if dry_run:
         logging.info("DRY RUN: no database writes will be performed")
 
+    if args.snapshot:
+        snapshot = load_snapshot(args.snapshot)
+        name_index = build_name_index(snapshot['courses'], normalized=args.normalized_match)
+        summary = orchestrate(
+            None, args.input, dry_run=True, name_index=name_index,
+            student_policy=args.student_policy, snapshot=snapshot,
+        )
+        log_summary(summary, args.normalized_match)
+        return
+
     conn = get_conn()
+    read_conn = get_read_conn()
+    if read_conn is not None:
+        logging.info("Read replica configured (DATABASE_READ_URL); max lag=%ss", args.max_replica_lag)
     try:
-        summary = orchestrate(conn, args.input, dry_run=args.dry_run)
-        logging.info(
-            "Done. Paths processed=%s, matched rows=%s, rows updated=%s",
-            summary['paths_processed'], summary['matched_rows'], summary['rows_updated']
+        name_index = None
+        if args.normalized_match:
+            name_index = load_new_course_name_index(choose_read_conn(conn, read_conn, args.max_replica_lag))
+        summary = orchestrate(
+            conn, args.input, dry_run=args.dry_run, name_index=name_index, student_policy=args.student_policy,
+            read_conn=read_conn, max_replica_lag=args.max_replica_lag, commit_every=args.commit_every,
         )
+        log_summary(summary, args.normalized_match)
     finally:
+        if read_conn is not None:
+            read_conn.close()
         conn.close()
 
 
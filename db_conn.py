@@ -1,4 +1,7 @@
+import logging
 import os
+from typing import Optional
+
 import psycopg2
 
 
@@ -13,3 +16,69 @@ def get_db_url() -> str:
 def get_conn():
     """Open a new psycopg2 connection using DATABASE_PUBLIC_URL."""
     return psycopg2.connect(get_db_url())
+
+
+DEFAULT_MAX_REPLICA_LAG = 30.0  # seconds
+
+
+def get_read_db_url() -> Optional[str]:
+    """Get optional read-replica URL from env var DATABASE_READ_URL."""
+    return os.getenv('DATABASE_READ_URL') or None
+
+
+def get_max_replica_lag() -> str:
+    """Raw DATABASE_READ_MAX_LAG setting (seconds), or the default as a string.
+
+    Left unparsed so the CLI can pass it as an argparse default: argparse converts string
+    defaults with the option's type, so a bad value is reported as a usage error naming
+    --max-replica-lag instead of a traceback while the parser is being built.
+    """
+    return os.getenv('DATABASE_READ_MAX_LAG') or str(DEFAULT_MAX_REPLICA_LAG)
+
+
+def get_read_conn():
+    """Open a connection to DATABASE_READ_URL, or return None when no replica is configured.
+
+    The connection is read-only and in autocommit, so it never sits idle in a transaction
+    holding a snapshot on the standby (recovery-conflict cancellations, or vacuum holdback on
+    the primary with hot_standby_feedback). Code that needs a transaction on it opens one.
+    """
+    url = get_read_db_url()
+    if not url:
+        return None
+    conn = psycopg2.connect(url)
+    conn.set_session(readonly=True, autocommit=True)
+    return conn
+
+
+def replica_lag_seconds(conn) -> Optional[float]:
+    """Return replication lag in seconds for `conn`, or None if it cannot be determined.
+
+    A server that is not in recovery (a primary, or a plain second instance in local tests)
+    reports 0, as does a standby that has replayed everything it received.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+            END
+            """
+        )
+        lag = cur.fetchone()[0]
+    conn.rollback()
+    return None if lag is None else float(lag)
+
+
+def choose_read_conn(conn, read_conn, max_lag: float = DEFAULT_MAX_REPLICA_LAG):
+    """Return read_conn if it is configured and within max_lag seconds of the primary, else conn."""
+    if read_conn is None:
+        return conn
+    lag = replica_lag_seconds(read_conn)
+    if lag is None or lag > max_lag:
+        logging.warning("Replica lag %s s exceeds %s s; reading from primary", lag, max_lag)
+        return conn
+    logging.debug("Replica lag %s s; reading from replica", lag)
+    return read_conn
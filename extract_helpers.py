@@ -1,4 +1,5 @@
 import re
+import unicodedata
 from typing import Optional
 from taas_schools import detect_taas_school
 
@@ -37,6 +38,19 @@ def extract_filename(path: str) -> str:
     return tail.strip()
 
 
+def normalize_name(name: str) -> str:
+    """Normalize a spreadsheet name for tolerant matching.
+
+    NFKD-decomposes and drops accents, casefolds, and collapses runs of
+    whitespace (trimming both ends). E.g. "  José  PÉREZ " -> "jose perez".
+    """
+    if not name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+
 def extract_company(path: str) -> str:
     """Extract company segment from path.
 
@@ -1,6 +1,5 @@
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 import logging
-import psycopg2.extras
 
 from tables_ops import (
     ensure_clone_table,
@@ -10,8 +9,25 @@ from tables_ops import (
 )
 from extract_helpers import extract_filename, infer_customer_type, extract_company, extract_course_language
 from taas_schools import detect_taas_school
+from name_index import lookup_new_course, discard_from_name_index
+from records import CourseOldRow, NewCourseRow, new_course_select_list
+from db_conn import DEFAULT_MAX_REPLICA_LAG, choose_read_conn
+from txn_batch import DEFAULT_COMMIT_EVERY, TxnBatch
 
 PROGRESS_EVERY = 100  # Log progress every N paths
+REPLICA_LAG_CHECK_EVERY = 100  # Re-check replica lag every N paths (only with read_conn)
+
+# Statements shared with preflight.py, which EXPLAINs exactly these
+NEW_COURSE_BY_NAME_SQL = "SELECT {select_list} FROM public.new_course WHERE spreadsheet_name = %s ORDER BY id"
+COURSE_OLD_BY_NAME_SQL = "SELECT id, student_id FROM public.course_old WHERE spreadsheet_name = %s"
+NEW_CLASS_COUNT_SQL = "SELECT COUNT(*) FROM public.new_class WHERE course_id = %s"
+DELETE_NEW_COURSE_SQL = "DELETE FROM public.new_course WHERE id = %s"
+CLASS_OLD_IDS_SQL = "SELECT id FROM public.class_old WHERE course_id = %s"
+CLASS_OLD_IDS_FIRST_SQL = CLASS_OLD_IDS_SQL + " LIMIT %s"
+COURSE_TAAS_SET_TYPE_SQL = "UPDATE public.course_taas SET customer_type = %s WHERE id = %s"
+CLASS_FETCH_SIZE = 2000  # Rows per round trip when streaming class ids
+# How to resolve different is_2on1 values for the same student within one run
+STUDENT_2ON1_POLICIES = ('last-wins', 'any-true')
 
 def _table_exists(conn, table: str) -> bool:
     with conn.cursor() as cur:
@@ -24,7 +40,7 @@ def _table_exists(conn, table: str) -> bool:
         )
         return cur.fetchone() is not None
 
-def _prune_new_course_duplicates(conn, rows, dry_run: bool = False):
+def _prune_new_course_duplicates(conn, rows, dry_run: bool = False, class_counts: Optional[dict] = None, read_conn=None):
     """Delete zero-class duplicates when all matches share same student_id.
 
     Rules:
@@ -34,90 +50,177 @@ def _prune_new_course_duplicates(conn, rows, dry_run: bool = False):
       * If some have classes (>0): delete all with 0 classes; keep the rest.
       * If all have 0 classes: keep the first, delete the others.
 
+    If `class_counts` ({course_id: n}, e.g. from a snapshot) is given, it is used instead of querying new_class.
+    Class counts are read from `read_conn` (defaults to conn); deletes always go to conn.
+
     Returns (kept_rows, messages, dup_count). Each message: "duplicate: delete course id=<id> | 0 classes".
     """
     messages = []
     dup_count = 0
     if len(rows) <= 1:
         return rows, messages, dup_count
-    sids = {r.get('student_id') for r in rows}
+    sids = {r.student_id for r in rows}
     if len(sids) != 1:
         return rows, messages, dup_count
     dup_count = len(rows) - 1
-    has_new_class = _table_exists(conn, 'new_class')
+    read_conn = read_conn or conn
     counts = {}
-    if has_new_class:
-        with conn.cursor() as cur:
+    if class_counts is not None:
+        for r in rows:
+            counts[r.id] = class_counts.get(r.id, 0)
+    elif _table_exists(read_conn, 'new_class'):
+        with read_conn.cursor() as cur:
             for r in rows:
-                cid = r.get('id')
-                cur.execute("SELECT COUNT(*) FROM public.new_class WHERE course_id = %s", (cid,))
+                cid = r.id
+                cur.execute(NEW_CLASS_COUNT_SQL, (cid,))
                 counts[cid] = cur.fetchone()[0]
     else:
         for r in rows:
-            counts[r.get('id')] = 0
-    zero = [r for r in rows if counts.get(r.get('id'), 0) == 0]
-    nonzero = [r for r in rows if counts.get(r.get('id'), 0) > 0]
+            counts[r.id] = 0
+    zero = [r for r in rows if counts.get(r.id, 0) == 0]
+    nonzero = [r for r in rows if counts.get(r.id, 0) > 0]
     to_delete = []
     if nonzero:
         to_delete = zero
     else:
         if len(zero) > 1:
             to_delete = zero[1:]
-    kept_ids = {r.get('id') for r in rows} - {r.get('id') for r in to_delete}
-    kept_rows = [r for r in rows if r.get('id') in kept_ids]
+    kept_ids = {r.id for r in rows} - {r.id for r in to_delete}
+    kept_rows = [r for r in rows if r.id in kept_ids]
     for r in to_delete:
-        cid = r.get('id')
+        cid = r.id
         messages.append(f"duplicate: delete course id={cid} | 0 classes")
         if dry_run:
             continue
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM public.new_course WHERE id = %s", (cid,))
-        conn.commit()
+            cur.execute(DELETE_NEW_COURSE_SQL, (cid,))
     return kept_rows, messages, dup_count
 
-def find_courses_by_spreadsheet_name(conn, spreadsheet_name: str) -> List[dict]:
-    """Find rows in legacy course table by exact spreadsheet_name.
+def find_courses_by_spreadsheet_name(conn, spreadsheet_name: str) -> List[CourseOldRow]:
+    """Find (id, student_id) rows in legacy course table by exact spreadsheet_name.
 
     Exact, case-sensitive, accent-sensitive match; no normalization.
     """
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(
-            "SELECT * FROM public.course_old WHERE spreadsheet_name = %s",
-            (spreadsheet_name,),
-        )
-        return list(cur.fetchall())
+    with conn.cursor() as cur:
+        cur.execute(COURSE_OLD_BY_NAME_SQL, (spreadsheet_name,))
+        return [CourseOldRow._make(r) for r in cur.fetchall()]
+
 
+def find_new_course_by_spreadsheet_name(conn, spreadsheet_name: str, cols: Optional[List[str]] = None) -> List[NewCourseRow]:
+    """Find rows in new_course by exact spreadsheet_name.
 
-def find_new_course_by_spreadsheet_name(conn, spreadsheet_name: str) -> List[dict]:
-    """Find rows in new_course by exact spreadsheet_name."""
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+    Only the columns orchestrate uses are fetched (see records.NEW_COURSE_FIELDS).
+    """
+    if cols is None:
+        cols = fetch_table_columns(conn, 'new_course')
+    with conn.cursor() as cur:
         cur.execute(
-            "SELECT * FROM public.new_course WHERE spreadsheet_name = %s",
+            NEW_COURSE_BY_NAME_SQL.format(select_list=new_course_select_list(cols)),
             (spreadsheet_name,),
         )
-        return list(cur.fetchall())
+        return [NewCourseRow._make(r) for r in cur.fetchall()]
 
 
-def update_student_is_2on1(conn, student_id: Optional[int], is_2on1: bool, dry_run: bool = False) -> None:
-    if student_id is None:
-        return
-    if dry_run:
-        return
+def _differs(current, values: dict) -> Optional[bool]:
+    """Compare target values with an already-fetched row record.
+
+    Returns None when the row does not carry every column (caller must ask the DB).
+    """
+    if current is None or any(not hasattr(current, col) for col in values):
+        return None
+    return any(getattr(current, col) != val for col, val in values.items())
+
+
+def guarded_update_sql(table: str, columns: List[str]) -> Tuple[str, str]:
+    """Return (update_sql, probe_sql) for a write that skips rows already holding the values.
+
+    update_sql params: (*values, id, *values); probe_sql (the dry-run SELECT) params: (id, *values).
+    """
+    set_sql = ", ".join(f"{col} = %s" for col in columns)
+    guard_sql = " OR ".join(f"{col} IS DISTINCT FROM %s" for col in columns)
+    return (
+        f"UPDATE public.{table} SET {set_sql} WHERE id = %s AND ({guard_sql})",
+        f"SELECT 1 FROM public.{table} WHERE id = %s AND ({guard_sql})",
+    )
+
+
+def new_course_update_columns(cols: List[str]) -> List[str]:
+    """Columns update_new_course writes, given the existing new_course columns."""
+    return ['customer_type', 'company_name'] + [c for c in ('course_language', 'taas_school') if c in cols]
+
+
+def _write_if_distinct(conn, table: str, row_id, values: dict, dry_run: bool = False) -> bool:
+    """UPDATE public.<table> SET values WHERE id = row_id, only if some value IS DISTINCT FROM the target.
+
+    In dry-run the same guard is evaluated with a SELECT. Returns True if the row changed (or would change).
+    """
+    update_sql, probe_sql = guarded_update_sql(table, list(values))
+    params = list(values.values())
     with conn.cursor() as cur:
-        cur.execute(
-            "UPDATE public.new_student_data SET is_2on1 = %s WHERE id = %s",
-            (is_2on1, student_id),
-        )
-    logging.info(f"Updated new_student_data id={student_id} is_2on1={is_2on1}")
+        if dry_run:
+            cur.execute(probe_sql, (row_id, *params))
+            return cur.fetchone() is not None
+        cur.execute(update_sql, (*params, row_id, *params))
+        return cur.rowcount > 0
+
+
+def update_student_is_2on1(conn, student_id: Optional[int], is_2on1: bool, dry_run: bool = False, current=None) -> bool:
+    """Set new_student_data.is_2on1, skipping the write when it already holds the value.
 
+    Returns True if the row changed (or would change in dry-run).
+    """
+    if student_id is None:
+        return False
+    values = {'is_2on1': is_2on1}
+    changed = _differs(current, values)
+    if changed is None or (changed and not dry_run):
+        changed = _write_if_distinct(conn, 'new_student_data', student_id, values, dry_run=dry_run)
+    if changed and not dry_run:
+        logging.info(f"Updated new_student_data id={student_id} is_2on1={is_2on1}")
+    return changed
+
+
+def _stage_student_is_2on1(pending: dict, student_id: Optional[int], is_2on1: bool, policy: str = 'last-wins') -> bool:
+    """Record a student-level is_2on1 write in the per-run map instead of writing it now.
+
+    On a conflicting value: 'any-true' keeps True if any path said so; 'last-wins' keeps the latest.
+    Returns True if this call hit a conflict.
+    """
+    if student_id is None:
+        return False
+    if student_id not in pending:
+        pending[student_id] = is_2on1
+        return False
+    prev = pending[student_id]
+    if prev == is_2on1:
+        return False
+    resolved = (prev or is_2on1) if policy == 'any-true' else is_2on1
+    logging.debug(f"Conflict new_student_data id={student_id} is_2on1 {prev} vs {is_2on1} -> {resolved} ({policy})")
+    pending[student_id] = resolved
+    return True
 
-def update_new_course(conn, row_id: int, type_value: str, company_name: str, course_language: str, taas_school: str, dry_run: bool = False) -> None:
+
+def update_new_course(
+    conn,
+    row_id: int,
+    type_value: str,
+    company_name: str,
+    course_language: str,
+    taas_school: str,
+    dry_run: bool = False,
+    current: Optional[NewCourseRow] = None,
+    cols: Optional[List[str]] = None,
+) -> bool:
     """Update a new_course row with inferred fields.
 
     Only sets optional fields (course_language, taas_school) if columns exist.
+    If `current` (the fetched row) already holds every target value, no statement is sent;
+    otherwise the UPDATE carries an IS DISTINCT FROM guard so unchanged rows are not rewritten.
+    Returns True if the row changed (or would change in dry-run).
     """
     # Build dynamic SET list based on existing columns to avoid errors if columns are missing
-    cols = fetch_table_columns(conn, 'new_course')
+    if cols is None:
+        cols = fetch_table_columns(conn, 'new_course')
     # Normalize to uppercase for DB storage; use None for empty strings
     type_db = (type_value or '').upper() or None
     company_db = (company_name or '').upper() or None
@@ -125,43 +228,65 @@ def update_new_course(conn, row_id: int, type_value: str, company_name: str, cou
     lang_db = (course_language or '-').upper()
     taas_school_db = (taas_school or '').upper() or None
 
-    set_parts = ["customer_type = %s", "company_name = %s"]
-    params = [type_db, company_db]
-    if 'course_language' in cols:
-        set_parts.append("course_language = %s")
-        params.append(lang_db)
-    if 'taas_school' in cols:
-        set_parts.append("taas_school = %s")
-        params.append(taas_school_db if type_db == 'TAAS' else None)
+    all_values = {
+        'customer_type': type_db,
+        'company_name': company_db,
+        'course_language': lang_db,
+        'taas_school': taas_school_db if type_db == 'TAAS' else None,
+    }
+    values = {col: all_values[col] for col in new_course_update_columns(cols)}
+
+    changed = _differs(current, values)
+    if changed is None or (changed and not dry_run):
+        changed = _write_if_distinct(conn, 'new_course', row_id, values, dry_run=dry_run)
+    if changed and not dry_run:
+        logging.info(
+            f"Updated new_course id={row_id} customer_type={type_db} company_name={company_db!r} course_language={lang_db!r} taas_school={taas_school_db!r}"
+        )
+    elif not changed:
+        logging.debug(f"Unchanged new_course id={row_id}")
+    return changed
 
-    set_sql = ", ".join(set_parts)
-    if dry_run:
-        return
+
+def find_classes_by_course_id(conn, course_id) -> Iterator[int]:
+    """Return related class ids from legacy table by course_id.
+
+    Typical courses have few classes: fetch up to CLASS_FETCH_SIZE ids in one plain query.
+    Only when there are more is the list re-read through a server-side cursor in
+    CLASS_FETCH_SIZE batches; that cursor lives in the current transaction, so consume it
+    before committing.
+    """
     with conn.cursor() as cur:
-        cur.execute(
-            f"UPDATE public.new_course SET {set_sql} WHERE id = %s",
-            (*params, row_id),
-        )
-    logging.info(
-        f"Updated new_course id={row_id} customer_type={type_db} company_name={company_db!r} course_language={lang_db!r} taas_school={taas_school_db!r}"
-    )
+        cur.execute(CLASS_OLD_IDS_FIRST_SQL, (course_id, CLASS_FETCH_SIZE + 1))
+        ids = [r[0] for r in cur.fetchall()]
+    if len(ids) <= CLASS_FETCH_SIZE:
+        return iter(ids)
+    return _stream_class_ids(conn, course_id)
+
 
+def _stream_class_ids(conn, course_id) -> Iterator[int]:
+    with conn.cursor(name=f"class_old_ids_{course_id}") as cur:
+        cur.itersize = CLASS_FETCH_SIZE
+        cur.execute(CLASS_OLD_IDS_SQL, (course_id,))
+        for (cls_id,) in cur:
+            yield cls_id
 
-def find_classes_by_course_id(conn, course_id) -> List[dict]:
-    """Fetch related classes from legacy table by course_id."""
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("SELECT * FROM public.class_old WHERE course_id = %s", (course_id,))
-        return list(cur.fetchall())
+
+def ensure_taas_clone_tables(conn) -> None:
+    """Create the *_taas clone tables if missing (commits; call once, before any batch step)."""
+    ensure_clone_table(conn, 'course_old', 'course_taas')
+    ensure_clone_table(conn, 'class_old', 'class_taas')
+    ensure_clone_table(conn, 'student_data_old', 'student_taas')
 
 
 def copy_student_if_needed(conn, student_id: Optional[int], student_cols: List[str], dry_run: bool = False) -> bool:
     """Ensure a student exists in student_taas by copying from student_data_old.
 
+    Expects the clone tables to exist (ensure_taas_clone_tables); does not commit.
     Returns True if a copy would happen (or did happen), else False.
     """
     if student_id is None:
         return False
-    ensure_clone_table(conn, 'student_data_old', 'student_taas')
     if record_exists_by_id(conn, 'student_taas', student_id):
         return False
     if dry_run:
@@ -174,25 +299,26 @@ def copy_student_if_needed(conn, student_id: Optional[int], student_cols: List[s
 
 def copy_course_and_related(
     conn,
-    course_row: dict,
+    course_row: CourseOldRow,
     customer_type: Optional[str],
     course_cols: List[str],
     class_cols: List[str],
     student_cols: List[str],
     dry_run: bool = False,
 ) -> Tuple[bool, int, int, int]:
-    """Copy a course and its classes/students into *_taas clones when applicable."""
-    course_id = course_row['id']
-    student_id = course_row.get('student_id')
+    """Copy a course and its classes/students into *_taas clones when applicable.
+
+    Never commits: run it inside a TxnBatch step, after ensure_taas_clone_tables, so the copy
+    follows the same commit-every-N / savepoint-per-step policy as orchestrate.
+    """
+    course_id = course_row.id
+    student_id = course_row.student_id
 
     # If no customer type (neither TAAS nor B2B), skip copying entirely
     if not customer_type:
         logging.debug(f"Skip copy for course id={course_id}: no customer_type inferred")
         return False, 0, 0, course_id
 
-    ensure_clone_table(conn, 'course_old', 'course_taas')
-    ensure_clone_table(conn, 'class_old', 'class_taas')
-
     course_copied = False
     if not record_exists_by_id(conn, 'course_taas', course_id):
         if dry_run:
@@ -205,16 +331,11 @@ def copy_course_and_related(
 
     if customer_type and not dry_run:
         with conn.cursor() as cur:
-            cur.execute(
-                "UPDATE public.course_taas SET customer_type = %s WHERE id = %s",
-                (customer_type, course_id),
-            )
+            cur.execute(COURSE_TAAS_SET_TYPE_SQL, (customer_type, course_id))
             logging.info(f"Set course_taas.id={course_id} customer_type={customer_type}")
 
-    classes = find_classes_by_course_id(conn, course_id)
     classes_copied = 0
-    for cls in classes:
-        cls_id = cls['id']
+    for cls_id in find_classes_by_course_id(conn, course_id):
         if not record_exists_by_id(conn, 'class_taas', cls_id):
             if dry_run:
                 logging.info(f"[dry-run] Would copy class_old id={cls_id} -> class_taas")
@@ -228,9 +349,6 @@ def copy_course_and_related(
     if copy_student_if_needed(conn, student_id, student_cols, dry_run=dry_run):
         student_copied = 1
 
-    if not dry_run:
-        conn.commit()
-
     return course_copied, classes_copied, student_copied, course_id
 
 
@@ -260,18 +378,68 @@ def _read_input_lines(input_path: str) -> List[str]:
     return text.splitlines()
 
 
-def orchestrate(conn, input_path: str, dry_run: bool = False):
-    """Main pipeline: read paths, infer fields, and update DB rows."""
+def orchestrate(
+    conn,
+    input_path: str,
+    dry_run: bool = False,
+    name_index: Optional[dict] = None,
+    student_policy: str = 'last-wins',
+    snapshot: Optional[dict] = None,
+    read_conn=None,
+    max_replica_lag: float = DEFAULT_MAX_REPLICA_LAG,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
+):
+    """Main pipeline: read paths, infer fields, and update DB rows.
+
+    If `name_index` (see name_index.load_new_course_name_index) is given, spreadsheet_name
+    lookups are served from memory with exact-then-normalized matching instead of per-line queries.
+    new_student_data.is_2on1 writes are gathered per student_id and flushed once at the end;
+    conflicting values are resolved by `student_policy` (see STUDENT_2ON1_POLICIES).
+
+    With `snapshot` (see snapshot.load_snapshot) the whole run is decided in memory: `name_index`
+    must be built from the snapshot courses, `conn` is not used and the run is always a dry run.
+
+    With `read_conn` (a replica), lookups, class counts and dry-run probes go to the replica while
+    it is within `max_replica_lag` seconds (re-checked every REPLICA_LAG_CHECK_EVERY paths), else to conn.
+    Writes always go to conn; rows this run deleted or wrote are filtered out / re-checked on conn.
+
+    Each path (lookup included) and each student write runs under a savepoint (see
+    txn_batch.TxnBatch): a failing row is rolled back, logged and counted without losing the
+    batch, which commits every `commit_every` steps (0 = once at the end).
+    """
+    if snapshot is not None:
+        dry_run = True
     total_paths = 0
     total_updates = 0
+    total_unchanged = 0
+    total_student_updates = 0
+    total_student_unchanged = 0
     total_matched_rows = 0
+    total_normalized_matches = 0
+    total_ambiguous_matches = 0
+    pending_students = {}  # student_id -> is_2on1
+    conflicted_students = set()
+    # Read-your-writes: a replica (or a preloaded name index) does not see this run's changes yet
+    deleted_course_ids = set()
+    written_course_ids = set()
 
     logging.info(f"Reading input file: {input_path} (dry_run={dry_run})")
+    if snapshot is not None:
+        course_cols = snapshot['new_course_columns']
+        class_counts = snapshot['class_counts'] if snapshot['has_new_class'] else {}
+    else:
+        course_cols = fetch_table_columns(conn, 'new_course')
+        class_counts = None
+    reader = choose_read_conn(conn, read_conn, max_replica_lag)
+    batch = TxnBatch(conn, commit_every=commit_every, dry_run=dry_run, read_conn=reader)
     for line in _read_input_lines(input_path):
         s = line.strip()
         if not s:
             continue
         total_paths += 1
+        if read_conn is not None and total_paths % REPLICA_LAG_CHECK_EVERY == 0:
+            reader = choose_read_conn(conn, read_conn, max_replica_lag)
+            batch.read_conn = reader
 
         filename = extract_filename(s)
         if not filename:
@@ -291,13 +459,41 @@ def orchestrate(conn, input_path: str, dry_run: bool = False):
         taas_school = detect_taas_school(s) if (type_value == 'taas') else None
         is_2on1 = ('2-1' in s)
 
-        rows = find_new_course_by_spreadsheet_name(conn, filename)
-        if rows:
-            # Deduplicate by (spreadsheet_name, student_id): keep first per student
-            rows, dup_msgs, dup_count = _prune_new_course_duplicates(conn, rows, dry_run=dry_run)
-            total_matched_rows += len(rows)
+        # Per-path results are only merged into the run totals if the path's savepoint is released
+        path_updates = 0
+        path_unchanged = 0
+        path_written = []
+        path_students = []
+        with batch.step(f"path {s}") as outcome:
+            # The lookup is inside the step too: a failing (e.g. replica) read only loses this path
+            match_kind = None
+            if name_index is not None:
+                rows, match_kind = lookup_new_course(name_index, filename)
+            else:
+                rows = find_new_course_by_spreadsheet_name(reader, filename, cols=course_cols)
+            rows = [r for r in rows if r.id not in deleted_course_ids]
+            if match_kind == 'ambiguous':
+                total_ambiguous_matches += 1
+                logging.info("* %s | No Match (ambiguous normalized name)", s)
+                continue
+            if not rows:
+                logging.info("* %s | No Match", s)
+                continue
+
+            # Deduplicate by (spreadsheet_name, student_id): keep first per student.
+            # Only exact-name duplicates are pruned; a normalized hit is never a reason to delete.
+            matched = rows
+            if match_kind == 'normalized':
+                dup_msgs, dup_count = [], 0
+            else:
+                rows, dup_msgs, dup_count = _prune_new_course_duplicates(
+                    conn, rows, dry_run=dry_run, class_counts=class_counts, read_conn=reader
+                )
             # Print a concise, readable block per path
-            logging.info("* %s | Match", s)
+            if match_kind:
+                logging.info("* %s | Match (%s)", s, match_kind)
+            else:
+                logging.info("* %s | Match", s)
             if dup_count > 0:
                 logging.info("duplicates: %s", dup_count)
             for msg in dup_msgs:
@@ -315,17 +511,72 @@ def orchestrate(conn, input_path: str, dry_run: bool = False):
                 )
                 logging.info("new_student_data: [is_2on1:%s]", is_2on1)
 
-                update_new_course(conn, row['id'], type_value, company_name, course_language, taas_school, dry_run=dry_run)
-                update_student_is_2on1(conn, row.get('student_id'), is_2on1, dry_run=dry_run)
-                total_updates += 1
+                # Dry-run probes are reads; a row already written this run is re-checked on the primary
+                current = None if row.id in written_course_ids else row
+                if update_new_course(reader if dry_run else conn, row.id, type_value, company_name, course_language,
+                                     taas_school, dry_run=dry_run, current=current, cols=course_cols):
+                    path_written.append(row.id)
+                    path_updates += 1
+                else:
+                    path_unchanged += 1
+                path_students.append(row.student_id)
+        if not outcome['ok']:
+            continue
+
+        if not dry_run:
+            kept_ids = {r.id for r in rows}
+            deleted = [r for r in matched if r.id not in kept_ids]
+            deleted_course_ids.update(r.id for r in deleted)
+            written_course_ids.update(path_written)
+            if name_index is not None:
+                discard_from_name_index(name_index, deleted)
+        total_matched_rows += len(rows)
+        if match_kind == 'normalized':
+            total_normalized_matches += 1
+        total_updates += path_updates
+        total_unchanged += path_unchanged
+        for student_id in path_students:
+            if _stage_student_is_2on1(pending_students, student_id, is_2on1, student_policy):
+                conflicted_students.add(student_id)
+
+    logging.info(
+        "Flushing new_student_data is_2on1 for %s students (%s conflicts, policy=%s)",
+        len(pending_students), len(conflicted_students), student_policy,
+    )
+    for student_id, is_2on1 in pending_students.items():
+        current = None
+        if snapshot is not None:
+            current = snapshot['students'].get(student_id)
+            if current is None:
+                # No such new_student_data row: the UPDATE would match nothing
+                total_student_unchanged += 1
+                continue
+        changed = False
+        with batch.step(f"new_student_data id={student_id}") as outcome:
+            changed = update_student_is_2on1(
+                reader if dry_run else conn, student_id, is_2on1, dry_run=dry_run, current=current
+            )
+        if not outcome['ok']:
+            continue
+        if changed:
+            total_student_updates += 1
         else:
-            logging.info("* %s | No Match", s)
+            total_student_unchanged += 1
 
-    if not dry_run:
-        conn.commit()
+    batch.commit()
+    stats = batch.stats()
 
     return {
         'paths_processed': total_paths,
         'matched_rows': total_matched_rows,
         'rows_updated': total_updates,
+        'rows_unchanged': total_unchanged,
+        'students_updated': total_student_updates,
+        'students_unchanged': total_student_unchanged,
+        'student_conflicts': len(conflicted_students),
+        'normalized_matches': total_normalized_matches,
+        'ambiguous_matches': total_ambiguous_matches,
+        'commits': stats['commits'],
+        'commit_seconds': stats['commit_seconds'],
+        'failed_steps': stats['failed_steps'],
     }
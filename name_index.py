@@ -0,0 +1,99 @@
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from extract_helpers import normalize_name
+from records import NewCourseRow, new_course_select_list
+from tables_ops import fetch_table_columns
+
+INDEX_FETCH_SIZE = 10000  # Rows per round trip when loading new_course
+# Shared with preflight.py (full scan by design)
+NAME_INDEX_SQL = "SELECT {select_list} FROM public.new_course ORDER BY id"
+
+
+def build_name_index(rows: Iterable[NewCourseRow], normalized: bool = True) -> dict:
+    """Build exact and normalized hash indexes over new_course row records.
+
+    Returns {'exact': {spreadsheet_name: [row, ...]}, 'normalized': {normalize_name(...): [row, ...]},
+    'normalized_match': normalized}. Rows keep their input order within each bucket. With
+    normalized=False the normalized map stays empty, so lookups are exact-only.
+    """
+    exact = {}
+    by_normalized = {}
+    for row in rows:
+        name = row.spreadsheet_name
+        if not name:
+            continue
+        exact.setdefault(name, []).append(row)
+        if normalized:
+            by_normalized.setdefault(normalize_name(name), []).append(row)
+    return {'exact': exact, 'normalized': by_normalized, 'normalized_match': normalized}
+
+
+def load_new_course_name_index(conn) -> dict:
+    """Load new_course once and index it in memory.
+
+    Besides (id, spreadsheet_name, student_id), the current values of the columns orchestrate
+    may overwrite are kept so unchanged rows can be skipped without another query.
+    """
+    select_list = new_course_select_list(fetch_table_columns(conn, 'new_course'))
+
+    def _rows():
+        # Server-side cursor: stream the table instead of materializing it client-side twice
+        with conn.cursor(name='new_course_name_index') as cur:
+            cur.itersize = INDEX_FETCH_SIZE
+            cur.execute(NAME_INDEX_SQL.format(select_list=select_list))
+            for r in cur:
+                yield NewCourseRow._make(r)
+
+    # Named cursors need a transaction; the replica connection runs in autocommit
+    autocommit = conn.autocommit
+    if autocommit:
+        conn.autocommit = False
+    try:
+        index = build_name_index(_rows())
+    finally:
+        if autocommit:
+            conn.rollback()
+            conn.autocommit = True
+    logging.info(
+        "Loaded new_course name index: %s exact names, %s normalized keys",
+        len(index['exact']), len(index['normalized']),
+    )
+    return index
+
+
+def lookup_new_course(index: dict, spreadsheet_name: str, normalized: bool = True) -> Tuple[List[NewCourseRow], Optional[str]]:
+    """Look up rows by spreadsheet_name: exact first, then the normalized form.
+
+    Returns (rows, kind) where kind is 'exact', 'normalized', or None when nothing matched.
+    A normalized key shared by more than one distinct real spreadsheet_name cannot be resolved
+    safely; it returns ([], 'ambiguous'). On an index built with normalized=False, exact hits
+    have kind None too, matching the unlabelled live per-line lookup.
+    """
+    normalized = normalized and index['normalized_match']
+    rows = index['exact'].get(spreadsheet_name)
+    if rows:
+        return list(rows), 'exact' if normalized else None
+    if normalized:
+        rows = index['normalized'].get(normalize_name(spreadsheet_name))
+        if rows:
+            names = {r.spreadsheet_name for r in rows}
+            if len(names) > 1:
+                logging.debug("Ambiguous normalized match for %r: %s", spreadsheet_name, sorted(names))
+                return [], 'ambiguous'
+            return list(rows), 'normalized'
+    return [], None
+
+
+def discard_from_name_index(index: dict, rows: Iterable[NewCourseRow]) -> None:
+    """Drop rows (e.g. deleted duplicates) from both indexes so later lookups don't return them."""
+    for row in rows:
+        name = row.spreadsheet_name
+        if not name:
+            continue
+        for bucket, key in ((index['exact'], name), (index['normalized'], normalize_name(name))):
+            kept = [r for r in bucket.get(key, []) if r.id != row.id]
+            if kept:
+                bucket[key] = kept
+            else:
+                bucket.pop(key, None)
@@ -0,0 +1,270 @@
+import json
+import logging
+from typing import List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import sql
+
+from logic_copy import (
+    CLASS_FETCH_SIZE,
+    CLASS_OLD_IDS_FIRST_SQL,
+    CLASS_OLD_IDS_SQL,
+    COURSE_OLD_BY_NAME_SQL,
+    COURSE_TAAS_SET_TYPE_SQL,
+    DELETE_NEW_COURSE_SQL,
+    NEW_CLASS_COUNT_SQL,
+    NEW_COURSE_BY_NAME_SQL,
+    guarded_update_sql,
+    new_course_update_columns,
+)
+from name_index import NAME_INDEX_SQL
+from records import new_course_select_list
+from run_build_joins import JOIN_TABLES, table_exists
+from snapshot import CLASS_COUNTS_EXPORT_SQL, NEW_COURSE_EXPORT_SQL, STUDENTS_EXPORT_SQL
+from tables_ops import INSERT_FROM_OLD_SQL, RECORD_EXISTS_SQL, fetch_table_columns
+from verify_joins import DEFAULT_CHUNK_SIZE, build_verify_queries
+
+# Indexes the hot lookups rely on: (table, column).
+# The *_taas tables are cloned with LIKE ... INCLUDING IDENTITY INCLUDING DEFAULTS,
+# which does not copy indexes, so their `id` lookups are unindexed until created here.
+REQUIRED_INDEXES = [
+    ("new_course", "spreadsheet_name"),
+    ("course_old", "spreadsheet_name"),
+    ("new_class", "course_id"),
+    ("class_old", "course_id"),
+    ("course_old", "id"),
+    ("class_old", "id"),
+    ("student_data_old", "id"),
+    ("course_taas", "id"),
+    ("class_taas", "id"),
+    ("student_taas", "id"),
+]
+
+# Tables smaller than this (estimated rows) are fine to seq scan.
+DEFAULT_MIN_ROWS = 10000
+
+
+def _statement_templates(conn) -> List[Tuple[str, object, object, List[str], bool]]:
+    """Return (label, sql, sample_params, tables, full_scan) for every statement the tools run.
+
+    The SQL comes from the constants/builders the modules themselves execute, so the EXPLAIN
+    checks what actually runs. `full_scan` marks statements that read whole tables by design
+    (name index, snapshot export, verify); their seq scans are reported but not a NO-GO.
+    """
+    new_course_cols = fetch_table_columns(conn, 'new_course')
+    select_list = new_course_select_list(new_course_cols)
+    course_update, course_probe = guarded_update_sql('new_course', new_course_update_columns(new_course_cols))
+    n_course = len(new_course_update_columns(new_course_cols))
+    student_update, student_probe = guarded_update_sql('new_student_data', ['is_2on1'])
+
+    stmts = [
+        ("find_new_course_by_spreadsheet_name", NEW_COURSE_BY_NAME_SQL.format(select_list=select_list),
+         ('',), ['new_course'], False),
+        ("find_courses_by_spreadsheet_name", COURSE_OLD_BY_NAME_SQL, ('',), ['course_old'], False),
+        ("prune duplicates: class count", NEW_CLASS_COUNT_SQL, (0,), ['new_class'], False),
+        ("prune duplicates: delete", DELETE_NEW_COURSE_SQL, (0,), ['new_course'], False),
+        ("update_new_course", course_update, (*[None] * n_course, 0, *[None] * n_course), ['new_course'], False),
+        ("update_new_course (dry-run probe)", course_probe, (0, *[None] * n_course), ['new_course'], False),
+        ("update_student_is_2on1", student_update, (False, 0, False), ['new_student_data'], False),
+        ("update_student_is_2on1 (dry-run probe)", student_probe, (0, False), ['new_student_data'], False),
+        ("find_classes_by_course_id", CLASS_OLD_IDS_FIRST_SQL, (0, CLASS_FETCH_SIZE + 1), ['class_old'], False),
+        ("find_classes_by_course_id (stream)", CLASS_OLD_IDS_SQL, (0,), ['class_old'], False),
+        ("copy_course_and_related: set customer_type", COURSE_TAAS_SET_TYPE_SQL, (None, 0), ['course_taas'], False),
+        ("name index load", NAME_INDEX_SQL.format(select_list=select_list), None, ['new_course'], True),
+        ("snapshot: new_course", NEW_COURSE_EXPORT_SQL.format(select_list=select_list), None, ['new_course'], True),
+        ("snapshot: new_class counts", CLASS_COUNTS_EXPORT_SQL, None, ['new_class'], True),
+        ("snapshot: new_student_data", STUDENTS_EXPORT_SQL, None, ['new_student_data', 'new_course'], True),
+    ]
+    for table in ("course_taas", "class_taas", "student_taas"):
+        stmts.append((f"record_exists_by_id({table})", RECORD_EXISTS_SQL.format(table=table),
+                      (0,), [table], False))
+    for old_table, new_table in (("course_old", "course_taas"), ("class_old", "class_taas"),
+                                 ("student_data_old", "student_taas")):
+        cols_csv = ','.join(f'"{c}"' for c in fetch_table_columns(conn, old_table))
+        stmts.append((f"insert_from_old_by_id({old_table})",
+                      INSERT_FROM_OLD_SQL.format(new_table=new_table, old_table=old_table, cols=cols_csv),
+                      (0,), [old_table, new_table], False))
+    for base_table, taas_table, join_table in JOIN_TABLES:
+        tables = [base_table, taas_table, join_table]
+        if not all(table_exists(conn, t) for t in tables):
+            continue
+        queries = build_verify_queries(conn, base_table, taas_table, join_table)
+        if queries is None:
+            continue
+        sample = {'chunk': DEFAULT_CHUNK_SIZE, 'buckets': [0]}
+        for key, query in queries.items():
+            stmts.append((f"verify {join_table}: {key}", query, sample, tables, True))
+    return stmts
+
+
+def _estimated_rows(conn, table: str) -> Optional[int]:
+    """Planner row estimate from pg_class (cheap; no table scan).
+
+    Returns None when the table was never analyzed (reltuples is -1 on PostgreSQL 14+,
+    or 0 while the relation already has pages on disk), since the estimate is then unknown.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.reltuples::bigint, pg_relation_size(c.oid)
+            FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = %s
+            """,
+            (table,),
+        )
+        row = cur.fetchone()
+        if not row:
+            return 0
+        reltuples, size = int(row[0]), int(row[1])
+        if reltuples < 0 or (reltuples == 0 and size > 0):
+            return None
+        return reltuples
+
+
+def _index_name(table: str, column: str) -> str:
+    return f"{table}_{column}_idx"
+
+
+def find_leading_index(conn, table: str, column: str) -> Optional[Tuple[str, bool]]:
+    """Return (index_name, is_valid) of an index whose first key column is `column`, or None."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT ic.relname, i.indisvalid
+            FROM pg_index i
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = i.indkey[0]
+            WHERE n.nspname = 'public' AND t.relname = %s AND a.attname = %s
+            ORDER BY i.indisvalid DESC
+            LIMIT 1
+            """,
+            (table, column),
+        )
+        row = cur.fetchone()
+        return (row[0], bool(row[1])) if row else None
+
+
+def _seq_scans(plan: dict) -> List[str]:
+    """Collect relation names of Seq Scan nodes in an EXPLAIN (FORMAT JSON) plan tree."""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name'):
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def explain_seq_scans(conn, query, params) -> List[str]:
+    """EXPLAIN (without ANALYZE, so nothing is executed) and return seq-scanned tables.
+
+    `query` may be a string or a psycopg2.sql.Composable.
+    """
+    if isinstance(query, str):
+        query = sql.SQL(query)
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("EXPLAIN (FORMAT JSON) ") + query, params)
+        raw = cur.fetchone()[0]
+    doc = json.loads(raw) if isinstance(raw, str) else raw
+    return _seq_scans(doc[0]['Plan'])
+
+
+def create_index_concurrently(conn, table: str, column: str, invalid_name: Optional[str] = None) -> None:
+    """CREATE INDEX CONCURRENTLY (must run outside a transaction block).
+
+    A previous failed concurrent build leaves an INVALID index behind; drop it first.
+    """
+    # autocommit can only be switched outside an open transaction
+    conn.rollback()
+    prev_autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            if invalid_name:
+                logging.info("Dropping invalid index %s", invalid_name)
+                cur.execute(
+                    sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS public.{i}").format(i=sql.Identifier(invalid_name))
+                )
+            cur.execute(
+                sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {i} ON public.{t} ({c})").format(
+                    i=sql.Identifier(_index_name(table, column)),
+                    t=sql.Identifier(table),
+                    c=sql.Identifier(column),
+                )
+            )
+    finally:
+        conn.autocommit = prev_autocommit
+
+
+def run_preflight(conn, apply: bool = False, min_rows: int = DEFAULT_MIN_ROWS) -> bool:
+    """Check required indexes and EXPLAIN every statement template.
+
+    - Missing/invalid indexes on existing tables are reported (and created with `apply`).
+    - Seq scans on tables with at least `min_rows` estimated rows are reported, as are seq scans
+      on never-analyzed tables whose size is unknown.
+    - Statements that fail to plan are reported as errors.
+    Tables that do not exist yet are skipped. Returns True for go, False for no-go.
+    """
+    ok = True
+    existing = {}
+
+    def exists(table: str) -> bool:
+        if table not in existing:
+            existing[table] = table_exists(conn, table)
+        return existing[table]
+
+    logging.info("Checking indexes")
+    for table, column in REQUIRED_INDEXES:
+        if not exists(table):
+            logging.info("index %s(%s): table missing, skipped", table, column)
+            continue
+        found = find_leading_index(conn, table, column)
+        if found and found[1]:
+            logging.info("index %s(%s): OK (%s)", table, column, found[0])
+            continue
+        invalid_name = found[0] if found else None
+        state = f"INVALID ({invalid_name})" if found else "MISSING"
+        if not apply:
+            logging.warning("index %s(%s): %s", table, column, state)
+            ok = False
+            continue
+        logging.info("index %s(%s): %s -> creating %s", table, column, state, _index_name(table, column))
+        create_index_concurrently(conn, table, column, invalid_name=invalid_name)
+    # Release the snapshot held by the catalog reads above
+    conn.rollback()
+
+    logging.info("Checking query plans (seq scans on tables >= %s rows)", min_rows)
+    for label, query, params, tables, full_scan in _statement_templates(conn):
+        if not all(exists(t) for t in tables):
+            logging.info("plan %s: table missing, skipped", label)
+            continue
+        try:
+            scanned = explain_seq_scans(conn, query, params)
+        except psycopg2.Error as e:
+            # A statement that does not plan (e.g. a *_taas clone that drifted from its source) is a NO-GO
+            conn.rollback()
+            logging.warning("plan %s: ERROR %s", label, str(e).strip())
+            ok = False
+            continue
+        estimates = {t: _estimated_rows(conn, t) for t in scanned}
+        large = [t for t, n in estimates.items() if n is not None and n >= min_rows]
+        unknown = [t for t, n in estimates.items() if n is None]
+        if full_scan:
+            logging.info("plan %s: full scan by design%s", label, f" ({', '.join(large + unknown)})" if large or unknown else "")
+            continue
+        if large:
+            logging.warning("plan %s: Seq Scan on %s", label, ", ".join(large))
+            ok = False
+        if unknown:
+            logging.warning(
+                "plan %s: Seq Scan on %s (never analyzed, size unknown; run ANALYZE and re-check)",
+                label, ", ".join(unknown),
+            )
+            ok = False
+        if not large and not unknown:
+            logging.info("plan %s: OK", label)
+    conn.rollback()
+
+    logging.info("Preflight result: %s", "GO" if ok else "NO-GO")
+    return ok
@@ -0,0 +1,33 @@
+from collections import namedtuple
+from typing import List
+
+# Lightweight row records (namedtuples: tuple storage, no per-row __dict__) for the
+# column-projected fetches in logic_copy/name_index, instead of SELECT * dicts.
+
+# new_course columns orchestrate needs: match keys plus the values it may overwrite
+NEW_COURSE_FIELDS = (
+    'id',
+    'spreadsheet_name',
+    'student_id',
+    'customer_type',
+    'company_name',
+    'course_language',
+    'taas_school',
+)
+# Columns that may be missing in older schemas; selected as NULL in that case
+OPTIONAL_NEW_COURSE_FIELDS = ('course_language', 'taas_school')
+
+NewCourseRow = namedtuple('NewCourseRow', NEW_COURSE_FIELDS)
+CourseOldRow = namedtuple('CourseOldRow', ('id', 'student_id'))
+StudentRow = namedtuple('StudentRow', ('id', 'is_2on1'))
+
+
+def new_course_select_list(cols: List[str]) -> str:
+    """SELECT list for NewCourseRow given the existing new_course columns."""
+    parts = []
+    for field in NEW_COURSE_FIELDS:
+        if field in OPTIONAL_NEW_COURSE_FIELDS and field not in cols:
+            parts.append(f"NULL AS {field}")
+        else:
+            parts.append(field)
+    return ", ".join(parts)
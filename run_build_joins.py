@@ -8,6 +8,13 @@ from psycopg2 import sql
 from db_conn import get_conn
 from tables_ops import ensure_clone_table, fetch_table_columns
 
+# (base_table, taas_table, join_table), in build order
+JOIN_TABLES = [
+    ("course", "course_taas", "course_join"),
+    ("class", "class_taas", "class_join"),
+    ("student_data", "student_taas", "student_data_join"),
+]
+
 
 def setup_logging(verbose: bool = False) -> None:
     level = logging.DEBUG if verbose else logging.INFO
@@ -197,10 +204,8 @@ def main():
 
     conn = get_conn()
     try:
-        # Order: course, class, student_data
-        build_join_table(conn, base_table="course", taas_table="course_taas", join_table="course_join", recreate=args.recreate)
-        build_join_table(conn, base_table="class", taas_table="class_taas", join_table="class_join", recreate=args.recreate)
-        build_join_table(conn, base_table="student_data", taas_table="student_taas", join_table="student_data_join", recreate=args.recreate)
+        for base_table, taas_table, join_table in JOIN_TABLES:
+            build_join_table(conn, base_table=base_table, taas_table=taas_table, join_table=join_table, recreate=args.recreate)
     finally:
         conn.close()
 
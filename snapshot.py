@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from records import NewCourseRow, StudentRow, new_course_select_list
+from run_build_joins import table_exists
+from tables_ops import fetch_table_columns
+
+# Files written by export_snapshot, in PostgreSQL COPY text format (tab-separated, \N = NULL)
+NEW_COURSE_FILE = 'new_course.tsv'
+CLASS_COUNTS_FILE = 'new_class_counts.tsv'
+STUDENTS_FILE = 'new_student_data.tsv'
+META_FILE = 'meta.json'
+
+# Export queries, shared with preflight.py (full scans by design)
+NEW_COURSE_EXPORT_SQL = "SELECT {select_list} FROM public.new_course ORDER BY id"
+CLASS_COUNTS_EXPORT_SQL = (
+    "SELECT course_id, COUNT(*) FROM public.new_class WHERE course_id IS NOT NULL GROUP BY course_id"
+)
+STUDENTS_EXPORT_SQL = (
+    "SELECT s.id, s.is_2on1 FROM public.new_student_data s "
+    "WHERE s.id IN (SELECT student_id FROM public.new_course)"
+)
+
+_COPY_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+
+def _copy_out(conn, query: str, path: str) -> None:
+    """Stream `COPY (query) TO STDOUT` into a local file."""
+    with open(path, 'w', encoding='utf-8', newline='') as f, conn.cursor() as cur:
+        cur.copy_expert(f"COPY ({query}) TO STDOUT", f)
+
+
+def export_snapshot(conn, out_dir: str) -> None:
+    """Export the columns orchestrate needs from new_course, new_class and new_student_data.
+
+    new_class is reduced server-side to per-course_id counts; new_student_data to the
+    students referenced by new_course. Everything is read in one REPEATABLE READ, READ ONLY
+    transaction so the three files describe the same point in time.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    # set_session only works outside a transaction block
+    conn.rollback()
+    # The replica connection runs in autocommit (read-only); the export needs one transaction
+    autocommit, readonly = conn.autocommit, conn.readonly
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True, autocommit=False)
+    try:
+        cols, has_new_class = _export_tables(conn, out_dir)
+    finally:
+        conn.rollback()
+        conn.set_session(
+            isolation_level='DEFAULT',
+            readonly='DEFAULT' if readonly is None else readonly,
+            autocommit=autocommit,
+        )
+
+    meta = {
+        'new_course_columns': cols,
+        'has_new_class': has_new_class,
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+    }
+    with open(os.path.join(out_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    logging.info("Snapshot written to %s", out_dir)
+
+
+def _export_tables(conn, out_dir: str) -> Tuple[List[str], bool]:
+    """Run the COPY exports on conn's current transaction; returns (new_course columns, has_new_class)."""
+    cols = fetch_table_columns(conn, 'new_course')
+    has_new_class = table_exists(conn, 'new_class')
+
+    logging.info("Exporting new_course -> %s", os.path.join(out_dir, NEW_COURSE_FILE))
+    _copy_out(
+        conn,
+        NEW_COURSE_EXPORT_SQL.format(select_list=new_course_select_list(cols)),
+        os.path.join(out_dir, NEW_COURSE_FILE),
+    )
+    logging.info("Exporting new_class counts -> %s", os.path.join(out_dir, CLASS_COUNTS_FILE))
+    if has_new_class:
+        _copy_out(
+            conn,
+            CLASS_COUNTS_EXPORT_SQL,
+            os.path.join(out_dir, CLASS_COUNTS_FILE),
+        )
+    else:
+        open(os.path.join(out_dir, CLASS_COUNTS_FILE), 'w').close()
+    logging.info("Exporting new_student_data -> %s", os.path.join(out_dir, STUDENTS_FILE))
+    _copy_out(
+        conn,
+        STUDENTS_EXPORT_SQL,
+        os.path.join(out_dir, STUDENTS_FILE),
+    )
+    return cols, has_new_class
+
+
+def _unescape(field: str) -> Optional[str]:
+    if field == '\\N':
+        return None
+    if '\\' not in field:
+        return field
+    return re.sub(r'\\(.)', lambda m: _COPY_ESCAPES.get(m.group(1), m.group(1)), field)
+
+
+def _read_copy_file(path: str) -> Iterator[List[Optional[str]]]:
+    """Parse a COPY text-format file into lists of fields (None for NULL)."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line:
+                yield [_unescape(x) for x in line.split('\t')]
+
+
+def _id(value: Optional[str]):
+    """Ids come back as text; keep them as ints when they are numeric."""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def load_snapshot(snapshot_dir: str) -> dict:
+    """Load a snapshot written by export_snapshot into memory.
+
+    Returns {'courses': [NewCourseRow], 'class_counts': {course_id: n}, 'students': {id: StudentRow},
+    'new_course_columns': [...], 'has_new_class': bool, 'exported_at': str}.
+    """
+    with open(os.path.join(snapshot_dir, META_FILE), 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    courses = []
+    for r in _read_copy_file(os.path.join(snapshot_dir, NEW_COURSE_FILE)):
+        r[0], r[2] = _id(r[0]), _id(r[2])
+        courses.append(NewCourseRow._make(r))
+    snapshot['courses'] = courses
+    snapshot['class_counts'] = {
+        _id(course_id): int(n)
+        for course_id, n in _read_copy_file(os.path.join(snapshot_dir, CLASS_COUNTS_FILE))
+    }
+    students = {}
+    for sid, is_2on1 in _read_copy_file(os.path.join(snapshot_dir, STUDENTS_FILE)):
+        sid = _id(sid)
+        students[sid] = StudentRow(sid, None if is_2on1 is None else is_2on1 == 't')
+    snapshot['students'] = students
+
+    logging.info(
+        "Loaded snapshot %s (exported_at=%s): %s courses, %s course class counts, %s students",
+        snapshot_dir, snapshot.get('exported_at'), len(courses), len(snapshot['class_counts']), len(students),
+    )
+    return snapshot
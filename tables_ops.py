@@ -1,6 +1,10 @@
 from typing import List
 from psycopg2 import sql
 
+# Statements shared with preflight.py, which EXPLAINs exactly these
+RECORD_EXISTS_SQL = "SELECT 1 FROM public.{table} WHERE id = %s LIMIT 1"
+INSERT_FROM_OLD_SQL = "INSERT INTO public.{new_table} ({cols}) SELECT {cols} FROM public.{old_table} WHERE id = %s"
+
 
 def ensure_clone_table(conn, old_table: str, new_table: str) -> None:
     """Create new_table with structure cloned from old_table if it doesn't exist."""
@@ -46,7 +50,7 @@ def fetch_table_columns(conn, table: str) -> List[str]:
 def record_exists_by_id(conn, table: str, id_value) -> bool:
     """Check if a row exists by id in a public.* table."""
     with conn.cursor() as cur:
-        cur.execute(f"SELECT 1 FROM public.{table} WHERE id = %s LIMIT 1", (id_value,))
+        cur.execute(RECORD_EXISTS_SQL.format(table=table), (id_value,))
         return cur.fetchone() is not None
 
 
@@ -55,6 +59,6 @@ def insert_from_old_by_id(conn, old_table: str, new_table: str, columns: List[st
     cols_csv = ','.join([f'"{c}"' for c in columns])
     with conn.cursor() as cur:
         cur.execute(
-            f"INSERT INTO public.{new_table} ({cols_csv}) SELECT {cols_csv} FROM public.{old_table} WHERE id = %s",
+            INSERT_FROM_OLD_SQL.format(new_table=new_table, old_table=old_table, cols=cols_csv),
             (id_value,),
         )
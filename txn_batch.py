@@ -0,0 +1,83 @@
+import logging
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+DEFAULT_COMMIT_EVERY = 500  # steps (paths / students) per transaction; 0 = single commit at the end
+
+
+class TxnBatch:
+    """One transaction policy for a run: commit every N steps, each step under a savepoint.
+
+    A step that raises a database error is rolled back to its savepoint, logged and counted,
+    and the rest of the batch is kept. With conn=None (offline snapshot runs) steps just run.
+    In dry-run nothing is committed. Savepoints are then only taken while reads go to conn
+    (they keep a failing read from aborting its transaction); when `read_conn` is a separate
+    connection, the primary gets no per-step round trips and a failure just rolls read_conn back.
+    `read_conn` is the connection reads currently go to; update it when that changes.
+    """
+
+    def __init__(self, conn, commit_every: int = DEFAULT_COMMIT_EVERY, dry_run: bool = False, read_conn=None):
+        self.conn = conn
+        self.read_conn = read_conn
+        self.commit_every = commit_every
+        self.dry_run = dry_run
+        self.pending = 0
+        self.commits = 0
+        self.commit_seconds = 0.0
+        self.failed = 0
+
+    @contextmanager
+    def step(self, label: str):
+        """Run a block under a savepoint. Yields a dict whose 'ok' is False after a rolled-back failure."""
+        outcome = {'ok': True}
+        if self.conn is None:
+            yield outcome
+            return
+        separate_reader = self.read_conn is not None and self.read_conn is not self.conn
+        savepoint = not (self.dry_run and separate_reader)
+        if savepoint:
+            with self.conn.cursor() as cur:
+                cur.execute("SAVEPOINT batch_step")
+        try:
+            yield outcome
+        except psycopg2.Error as e:
+            if savepoint:
+                with self.conn.cursor() as cur:
+                    cur.execute("ROLLBACK TO SAVEPOINT batch_step")
+                    # ROLLBACK TO keeps the savepoint; release it so failures don't nest until commit
+                    cur.execute("RELEASE SAVEPOINT batch_step")
+            if separate_reader:
+                # No-op on the autocommit replica connection; clears an aborted read otherwise
+                self.read_conn.rollback()
+            self.failed += 1
+            outcome['ok'] = False
+            logging.error("%s failed, rolled back: %s", label, str(e).strip())
+            return
+        if savepoint:
+            with self.conn.cursor() as cur:
+                cur.execute("RELEASE SAVEPOINT batch_step")
+        self.pending += 1
+        if self.commit_every and self.pending >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        """Commit the pending steps (no-op in dry-run or when nothing is pending)."""
+        if self.conn is None or self.dry_run or not self.pending:
+            self.pending = 0
+            return
+        started = time.monotonic()
+        self.conn.commit()
+        elapsed = time.monotonic() - started
+        self.commits += 1
+        self.commit_seconds += elapsed
+        logging.debug("Committed %s steps in %.3fs", self.pending, elapsed)
+        self.pending = 0
+
+    def stats(self) -> dict:
+        return {
+            'commits': self.commits,
+            'commit_seconds': self.commit_seconds,
+            'failed_steps': self.failed,
+        }
@@ -0,0 +1,211 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from psycopg2 import sql
+
+from tables_ops import fetch_table_columns
+
+DEFAULT_CHUNK_SIZE = 100000  # ids per bucket (id / chunk_size)
+MAX_REPORTED_IDS = 50  # per category, in the log
+
+INTEGER_TYPES = ('smallint', 'integer', 'bigint')
+
+
+def _column_types(conn, table: str) -> Dict[str, str]:
+    """Return {column: SQL type} for a public.* table (format_type, e.g. 'character varying(255)')."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = %s AND a.attnum > 0 AND NOT a.attisdropped
+            """,
+            (table,),
+        )
+        return dict(cur.fetchall())
+
+
+def _row_hash(alias: str, cols: List[Tuple[str, str]]) -> sql.Composed:
+    """64-bit row hash: first 16 hex digits of md5(ROW(...)::text), columns cast to the base types.
+
+    Casting mirrors the INSERT into the join table, which coerces *_taas values to base column types.
+    """
+    fields = sql.SQL(', ').join(
+        sql.SQL("{a}.{c}::{t}").format(a=sql.Identifier(alias), c=sql.Identifier(c), t=sql.SQL(t))
+        for c, t in cols
+    )
+    return sql.SQL("('x' || substr(md5(ROW({fields})::text), 1, 16))::bit(64)::bigint").format(fields=fields)
+
+
+def _bucket_filter(alias: str) -> sql.Composed:
+    return sql.SQL("{a}.id / %(chunk)s = ANY(%(buckets)s)").format(a=sql.Identifier(alias))
+
+
+def build_verify_queries(
+    conn,
+    base_table: str,
+    taas_table: str,
+    join_table: str,
+    updated_at_column: str = "updated_at",
+) -> Optional[dict]:
+    """Build the full-pass queries comparing join_table with base_table ∪ (taas_table minus base ids).
+
+    Rows copied from base_table are hashed on every base column. Rows added from taas_table are
+    hashed on the columns both tables share, minus updated_at_column (set to NOW() by the build).
+    On the join side, a row counts as base-copied when its id exists in base_table.
+
+    Returns {'expected_buckets', 'join_buckets', 'expected_ids', 'join_ids'}, or None when the
+    tables are missing or id is not an integer. Placeholders: %(chunk)s, and %(buckets)s for *_ids.
+    """
+    base_cols = fetch_table_columns(conn, base_table)
+    taas_cols = set(fetch_table_columns(conn, taas_table))
+    join_cols = fetch_table_columns(conn, join_table)
+    if not base_cols or not taas_cols or not join_cols:
+        logging.warning("verify %s: missing one of %s, %s, %s; skipped", join_table, base_table, taas_table, join_table)
+        return None
+    types = _column_types(conn, base_table)
+    if types.get('id') not in INTEGER_TYPES:
+        logging.warning("verify %s: id column of %s is %s, need an integer id; skipped", join_table, base_table, types.get('id'))
+        return None
+    full_cols = [(c, types[c]) for c in base_cols]
+    shared_cols = [(c, types[c]) for c in base_cols if c in taas_cols and c != updated_at_column]
+
+    def expected_rows(drill: bool):
+        return sql.SQL(
+            """
+            SELECT b.id AS id, {hb} AS h FROM public.{base} b {where_b}
+            UNION ALL
+            SELECT t.id, {ht} FROM public.{taas} t
+            WHERE NOT EXISTS (SELECT 1 FROM public.{base} b2 WHERE b2.id = t.id) {and_t}
+            """
+        ).format(
+            hb=_row_hash('b', full_cols),
+            ht=_row_hash('t', shared_cols),
+            base=sql.Identifier(base_table),
+            taas=sql.Identifier(taas_table),
+            where_b=sql.SQL("WHERE {f}").format(f=_bucket_filter('b')) if drill else sql.SQL(""),
+            and_t=sql.SQL("AND {f}").format(f=_bucket_filter('t')) if drill else sql.SQL(""),
+        )
+
+    def join_rows(drill: bool):
+        return sql.SQL(
+            """
+            SELECT j.id AS id, CASE WHEN b.id IS NULL THEN {ht} ELSE {hb} END AS h
+            FROM public.{join} j
+            LEFT JOIN (SELECT DISTINCT id FROM public.{base}) b ON b.id = j.id
+            {where_j}
+            """
+        ).format(
+            hb=_row_hash('j', full_cols),
+            ht=_row_hash('j', shared_cols),
+            join=sql.Identifier(join_table),
+            base=sql.Identifier(base_table),
+            where_j=sql.SQL("WHERE {f}").format(f=_bucket_filter('j')) if drill else sql.SQL(""),
+        )
+
+    def buckets(rows):
+        # COUNT and SUM of row hashes per bucket: order-independent, one pass over each table
+        return sql.SQL(
+            "SELECT id / %(chunk)s AS bucket, COUNT(*), SUM(h) FROM ({rows}) s GROUP BY 1"
+        ).format(rows=rows)
+
+    def ids(rows):
+        return sql.SQL("SELECT id, h FROM ({rows}) s").format(rows=rows)
+
+    return {
+        'expected_buckets': buckets(expected_rows(False)),
+        'join_buckets': buckets(join_rows(False)),
+        'expected_ids': ids(expected_rows(True)),
+        'join_ids': ids(join_rows(True)),
+    }
+
+
+def _fetch_buckets(conn, query, chunk_size: int) -> Dict[int, tuple]:
+    with conn.cursor() as cur:
+        cur.execute(query, {'chunk': chunk_size})
+        return {bucket: (count, total) for bucket, count, total in cur.fetchall()}
+
+
+def _fetch_hashes(conn, query, chunk_size: int, bucket_ids: List[int]) -> Dict[int, List[int]]:
+    with conn.cursor() as cur:
+        cur.execute(query, {'chunk': chunk_size, 'buckets': bucket_ids})
+        out = {}
+        for row_id, h in cur.fetchall():
+            out.setdefault(row_id, []).append(h)
+    for hs in out.values():
+        hs.sort()
+    return out
+
+
+def verify_join_table(
+    conn,
+    connect: Callable,
+    base_table: str,
+    taas_table: str,
+    join_table: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> bool:
+    """Verify join_table == base_table ∪ (taas_table rows whose id is not in base_table).
+
+    Both sides are bucketed by id / chunk_size and summarized (count, hash sum) in one pass each,
+    run in parallel on two read-only connections opened with `connect`. The tables need no index
+    on id. Only differing buckets are fetched per id (one more pass per side) to report the ids.
+    Rows with a NULL id are compared as one extra bucket and reported by count.
+    Returns True if everything matches.
+    """
+    queries = build_verify_queries(conn, base_table, taas_table, join_table)
+    conn.rollback()
+    if queries is None:
+        return False
+
+    conns = []
+    try:
+        for _ in range(2):
+            c = connect()
+            c.set_session(readonly=True, autocommit=True)
+            conns.append(c)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            logging.info("verify %s: summarizing both sides in buckets of %s ids", join_table, chunk_size)
+            exp_f = pool.submit(_fetch_buckets, conns[0], queries['expected_buckets'], chunk_size)
+            act_f = pool.submit(_fetch_buckets, conns[1], queries['join_buckets'], chunk_size)
+            expected, actual = exp_f.result(), act_f.result()
+            differing = [b for b in expected.keys() | actual.keys() if expected.get(b) != actual.get(b)]
+            if not differing:
+                logging.info("verify %s: OK (%s buckets)", join_table, len(expected))
+                return True
+            if None in differing:
+                # Rows with a NULL id land in bucket NULL; they cannot be fetched by id, only counted
+                differing.remove(None)
+                logging.warning(
+                    "verify %s: rows with a NULL id differ (expected %s, join has %s)",
+                    join_table, expected.get(None, (0,))[0], actual.get(None, (0,))[0],
+                )
+                if not differing:
+                    return False
+            differing.sort()
+            logging.warning(
+                "verify %s: %s of %s buckets differ; fetching their ids",
+                join_table, len(differing), len(expected.keys() | actual.keys()),
+            )
+            exp_f = pool.submit(_fetch_hashes, conns[0], queries['expected_ids'], chunk_size, differing)
+            act_f = pool.submit(_fetch_hashes, conns[1], queries['join_ids'], chunk_size, differing)
+            exp_ids, act_ids = exp_f.result(), act_f.result()
+    finally:
+        for c in conns:
+            c.close()
+
+    report = {
+        'missing from join': exp_ids.keys() - act_ids.keys(),
+        'unexpected in join': act_ids.keys() - exp_ids.keys(),
+        'differing': {i for i in exp_ids.keys() & act_ids.keys() if exp_ids[i] != act_ids[i]},
+    }
+    for label, found in report.items():
+        found = sorted(found)
+        if found:
+            shown = ", ".join(str(i) for i in found[:MAX_REPORTED_IDS])
+            more = f" (+{len(found) - MAX_REPORTED_IDS} more)" if len(found) > MAX_REPORTED_IDS else ""
+            logging.warning("verify %s: %s %s ids: %s%s", join_table, len(found), label, shown, more)
+    return False